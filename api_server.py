@@ -2,16 +2,101 @@
 Flask API server for UQDeadline web scraping
 Run with: python api_server.py
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, send_from_directory
 from flask_cors import CORS
 from ecp_parse import ecpparser
+import cProfile
 import datetime
+import hmac
+import os
+import random
 import re
 import re
+import threading
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
+# ------------------------------------------------------------
+# On-demand profiling (off unless PROFILING_ENABLED=1)
+# Profiles are written in cProfile/pstats format (.prof), which can be
+# opened with snakeviz, tuna, flameprof or `python -m pstats`.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+# Operators send this token in the X-Profile-Token header (never the URL, so it
+# stays out of request logs)
+# to profile a single request, and to list/download stored profiles.
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+# Fraction of /api/* requests to profile automatically (0.0 - 1.0)
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+# Only the newest PROFILE_MAX_FILES profiles are kept on disk (at least 1)
+PROFILE_MAX_FILES = max(int(os.environ.get('PROFILE_MAX_FILES', '100')), 1)
+
+# cProfile can only have one active profiler at a time, so only one
+# request is profiled at once; others just run normally.
+_profile_lock = threading.Lock()
+
+def _has_profile_token():
+    """Check whether the request carries the operator profiling token"""
+    if not PROFILING_TOKEN:
+        return False
+    supplied = request.headers.get('X-Profile-Token', '')
+    # Compare bytes: compare_digest raises TypeError on non-ASCII str
+    return hmac.compare_digest(supplied.encode('utf-8'), PROFILING_TOKEN.encode('utf-8'))
+
+def _prune_profiles():
+    """Delete the oldest stored profiles beyond PROFILE_MAX_FILES"""
+    # File names start with a timestamp, so name order is age order
+    names = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof'))
+    for name in names[:max(len(names) - PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass
+
+def _should_profile():
+    """Decide whether the current request should be profiled"""
+    if not PROFILING_ENABLED:
+        return False
+    if not request.path.startswith('/api/') or request.path.startswith('/api/admin/'):
+        return False
+    if _has_profile_token():
+        return True
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+@app.before_request
+def start_profiling():
+    if not _should_profile() or not _profile_lock.acquire(blocking=False):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (e.g. a debugger) is already active
+        _profile_lock.release()
+        return
+    g.profiler = profiler
+
+@app.teardown_request
+def stop_profiling(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    try:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        # Truncate so long paths (e.g. /api/debug/ecp/<url>) stay under the
+        # filesystem's file name limit
+        route = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_')[:64]
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{timestamp}-{request.method}-{route}.prof"))
+        _prune_profiles()
+    except Exception as e:
+        print(f"Warning: Could not save profile: {e}")
+    finally:
+        _profile_lock.release()
+# ------------------------------------------------------------
+
 def extract_deadlines_from_ecp(ecp_url):
     """Extract all deadlines from an ECP URL, handling multiple dates per assessment"""
     import requests
@@ -515,6 +600,44 @@ def debug_course(course_code):
     except Exception as e:
         return jsonify({'error': str(e), 'traceback': str(__import__('traceback').format_exc())}), 500
 
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List stored request profiles (operators only)"""
+    if not PROFILING_ENABLED:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not _has_profile_token():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    profiles = []
+    if os.path.isdir(PROFILE_DIR):
+        for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+            if not name.endswith('.prof'):
+                continue
+            try:
+                stat = os.stat(os.path.join(PROFILE_DIR, name))
+            except OSError:
+                # Pruned by another request since listdir
+                continue
+            profiles.append({
+                'name': name,
+                'size': stat.st_size,
+                'created': datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc).isoformat(),
+                'download_url': '/api/admin/profiles/' + name,
+            })
+    return jsonify({'profiles': profiles})
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """Download a stored request profile in pstats format (operators only)"""
+    if not PROFILING_ENABLED:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not _has_profile_token():
+        return jsonify({'error': 'Forbidden'}), 403
+    if not name.endswith('.prof'):
+        return jsonify({'error': 'Profile not found'}), 404
+    # send_from_directory rejects paths that escape PROFILE_DIR
+    return send_from_directory(PROFILE_DIR, name, as_attachment=True, mimetype='application/octet-stream')
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -4,75 +4,170 @@
 # sign into google calendar
 # insert into tasks
 
+import time
+_START = time.perf_counter()
 
-import datetime
-import os.path
+import os
+import sys
 from ecp_parse import ecpparser
+_IMPORTED = time.perf_counter()
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+# The Google auth and API client libraries are slow to import, so they are
+# only imported once we actually need to talk to Google (see get_credentials
+# and get_service).
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/tasks"]
+TOKEN_FILE = "token.json"
+CREDENTIALS_FILE = "credentials.json"
 
 
-def main():
-  """Shows basic usage of the Google Calendar API.
-  Prints the start and name of the next 10 events on the user's calendar.
-  """
+def save_credentials(creds):
+  """Write credentials to token.json, readable only by the current user."""
+  import tempfile
+
+  # Write to a private temp file next to token.json and swap it in, so the
+  # token is never world-readable and a crash can't leave it half written.
+  # mkstemp creates the file readable and writable only by the current user.
+  fd, tmp_path = tempfile.mkstemp(
+      prefix=".token-", suffix=".json", dir=os.path.dirname(os.path.abspath(TOKEN_FILE))
+  )
+  try:
+    token = os.fdopen(fd, "w")
+  except BaseException:
+    os.close(fd)
+    os.remove(tmp_path)
+    raise
+  try:
+    # The with-block closes the file before it is replaced or removed
+    with token:
+      token.write(creds.to_json())
+    os.replace(tmp_path, TOKEN_FILE)
+  except BaseException:
+    os.remove(tmp_path)
+    raise
+
+
+def get_credentials():
+  """Load saved credentials, refreshing or running the OAuth flow if needed."""
+  from google.auth.exceptions import RefreshError
+  from google.auth.transport.requests import Request
+  from google.oauth2.credentials import Credentials
+
   creds = None
   # The file token.json stores the user's access and refresh tokens, and is
   # created automatically when the authorization flow completes for the first
   # time.
-  if os.path.exists("token.json"):
-    creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-  # If there are no (valid) credentials available, let the user log in.
-  if not creds or not creds.valid:
-    if creds and creds.expired and creds.refresh_token:
-      creds.refresh(Request())
-    else:
-      flow = InstalledAppFlow.from_client_secrets_file(
-          "credentials.json", SCOPES
-      )
-      creds = flow.run_local_server(port=0)
-    # # Save the credentials for the next run
-    # with open("token.json", "w") as token:
-    #   token.write(creds.to_json())
+  if os.path.exists(TOKEN_FILE):
+    creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+  if creds and creds.valid:
+    return creds
 
+  if creds and creds.expired and creds.refresh_token:
     try:
-        service = build("tasks", "v1", credentials=creds)
-        # Call the Tasks API
-   
-        task_dues = ecpparser()
-        if task_dues is None:
-           return
+      creds.refresh(Request())
+    except RefreshError:
+      # Refresh token was revoked or expired, fall back to logging in again
+      creds = None
+  else:
+    creds = None
+
+  # If there are no (valid) credentials available, let the user log in.
+  if creds is None:
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
+    creds = flow.run_local_server(port=0)
+
+  # Save the credentials for the next run
+  save_credentials(creds)
+  return creds
+
+
+def get_service(creds):
+  """Build the Tasks API client from the discovery document bundled with
+  google-api-python-client, rather than fetching it over the network."""
+  from googleapiclient.discovery import build
+
+  return build(
+      "tasks", "v1", credentials=creds, static_discovery=True, cache_discovery=False
+  )
+
+
+class _FirstPrompt(Exception):
+  """Raised in place of the CLI's first input() call by startup_time."""
+
+
+def startup_time():
+  """Print how long the CLI takes to import and to reach its first prompt.
+
+  Run with: python interface.py --startup-time
+  """
+  import builtins
+
+  def first_prompt(prompt=""):
+    raise _FirstPrompt(time.perf_counter())
+
+  # Run the CLI as normal, but stop at the first input() instead of waiting
+  real_input = builtins.input
+  builtins.input = first_prompt
+  try:
+    ecpparser()
+  except _FirstPrompt as reached:
+    prompt_at = reached.args[0]
+  else:
+    print("ecpparser() finished without prompting")
+    return
+  finally:
+    builtins.input = real_input
+
+  print(f"Import time:          {(_IMPORTED - _START) * 1000:.1f} ms")
+  print(f"Time to first prompt: {(prompt_at - _START) * 1000:.1f} ms")
+  print(
+      "Not included: the OAuth browser login, which used to run before the\n"
+      "first prompt on every run and now only runs when no saved token works."
+  )
+
+
+def main():
+  """Parses deadlines from a course's ECP and adds them to a new Google
+  Tasks list.
+  """
+  if "--startup-time" in sys.argv[1:]:
+    startup_time()
+    return
+
+  task_dues = ecpparser()
+  if task_dues is None:
+    return
+
+  tlist_name = input("\nGive your task list a name: ")
 
-        tlist_name = input("\nGive your task list a name: ")
+  from googleapiclient.errors import HttpError
 
-        tasklist_body = {
-           'title': tlist_name
-        }
-        new_list = service.tasklists().insert(body=tasklist_body).execute()
+  try:
+    service = get_service(get_credentials())
+    # Call the Tasks API
+    tasklist_body = {
+        'title': tlist_name
+    }
+    new_list = service.tasklists().insert(body=tasklist_body).execute()
 
-        print("\nPlease wait...")
+    print("\nPlease wait...")
 
-        for item in task_dues:
-           task = {
-              'title': item[0],
-              'due': item[1].isoformat('T'),
-              'notes': "Due at " + item[2]
-           }
-           service.tasks().insert(body=task, tasklist=new_list['id']).execute()
-        
-        print("\nDone!")
+    for item in task_dues:
+      task = {
+          'title': item[0],
+          'due': item[1].isoformat('T'),
+          'notes': "Due at " + item[2]
+      }
+      service.tasks().insert(body=task, tasklist=new_list['id']).execute()
 
+    print("\nDone!")
 
-    except HttpError as error:
-        print(f"An error occurred: {error}")
+  except HttpError as error:
+    print(f"An error occurred: {error}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+  main()